@@ -0,0 +1,210 @@
+import json
+from functools import partial
+
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from .cache import SERVICE_LIST_TIMEOUT, SERVICE_LIST_VERSION_KEY, catalog_l1, ensure_invalidation_listener, get_or_recompute, get_service_list_version, is_fresh, overlay_response, service_list_cache_key
+from .conditional import make_etag, not_modified, set_validators
+from .events import APPLICATION_STATUS_CHANNEL
+from .models import Application
+from .renderers import ORJSONRenderer
+from .views import ApplicationAPIView, CurrentUserAPIView, ServiceAPIView
+
+# Асинхронные версии read-путей API для запуска под ASGI (uvicorn).
+# Аутентификация, Redis и поиск черновика не блокируют event loop;
+# сериализация DRF остаётся синхронной и выполняется через sync_to_async.
+
+# Клиент привязан к event loop, поэтому модуль используется только под ASGI (один loop на процесс)
+_redis = None
+
+
+def get_async_redis():
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(settings.CACHES['default']['LOCATION'])
+    return _redis
+
+
+async def cache_aget(key):
+    """
+    Чтение ключа каталога: L1 в памяти процесса, затем Redis асинхронным клиентом
+    (тот же формат ключей и значений, что у django_redis).
+    """
+    ensure_invalidation_listener()
+    value = catalog_l1.get(key)
+    if value is not None:
+        return value
+    raw = await get_async_redis().get(cache.make_key(key))
+    if raw is None:
+        return None
+    value = cache.client.decode(raw)
+    catalog_l1.set(key, value)
+    return value
+
+
+async def authenticate(request):
+    """
+    Пользователь из JWT без запроса к БД; None для анонимного запроса.
+    """
+    result = JWTStatelessUserAuthentication().authenticate(request)
+    if result is None:
+        return None
+    user, _ = result
+    return await load_token_claims(user)
+
+
+async def load_token_claims(user):
+    if not {'username', 'is_staff', 'is_superuser'} <= set(user.token.payload):
+        # Старый токен без claims: данные придут из кэша пользователей, это синхронный путь
+        await sync_to_async(lambda: (user.username, user.is_staff, user.is_superuser))()
+    return user
+
+
+async def authenticate_stream(request):
+    """
+    EventSource не умеет передавать заголовки, поэтому для потока токен принимается и в ?token=.
+    """
+    if 'token' not in request.GET:
+        return await authenticate(request)
+    authentication = JWTStatelessUserAuthentication()
+    validated_token = authentication.get_validated_token(request.GET['token'].encode())
+    return await load_token_claims(authentication.get_user(validated_token))
+
+
+def json_response(data, status=200):
+    return HttpResponse(ORJSONRenderer().render(data), content_type='application/json', status=status)
+
+
+def unauthorized(exc=None):
+    if exc is None:
+        return json_response({'detail': 'Authentication credentials were not provided.'}, status=401)
+    detail = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+    return json_response(detail, status=exc.status_code)
+
+
+def async_read_view(read_handler, sync_view):
+    """
+    GET списка обрабатывается асинхронно, остальные методы - прежним синхронным APIView.
+    """
+    @csrf_exempt
+    async def view(request, *args, **kwargs):
+        if request.method == 'GET' and not kwargs:
+            try:
+                return await read_handler(request)
+            except AuthenticationFailed as exc:
+                return unauthorized(exc)
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+    return view
+
+
+async def service_list(request):
+    user = await authenticate(request)
+
+    # Поколение из L1; при промахе - синхронный путь, который не даст L1 откатиться к старому
+    ensure_invalidation_listener()
+    version = catalog_l1.get(SERVICE_LIST_VERSION_KEY)
+    if version is None:
+        version = await sync_to_async(get_service_list_version)()
+    cache_key = service_list_cache_key(request.GET, version=version)
+
+    draft_application_id = None
+    if user is not None:
+        draft_application_id = await Application.objects.filter(
+            user_id=user.id, status='draft', is_deleted=False
+        ).values_list('id', flat=True).afirst()
+
+    etag = make_etag(cache_key, draft_application_id)
+    response = not_modified(request, etag)
+    if response is not None:
+        return set_validators(response, etag)
+
+    record = await cache_aget(cache_key)
+    if record is not None and is_fresh(record):
+        entry = record['value']
+    else:
+        # Пересчёт с lock и ожиданием - синхронный путь, как в ServiceAPIView
+        build_list_entry = partial(ServiceAPIView().build_list_entry, Request(request))
+        entry = await sync_to_async(get_or_recompute)(cache_key, build_list_entry, SERVICE_LIST_TIMEOUT)
+
+    response = overlay_response(entry, draft_application_id=draft_application_id)
+    return set_validators(response, etag)
+
+
+async def application_list(request):
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+
+    drf_request = Request(request)
+    drf_request.user = user
+    view = ApplicationAPIView()
+    view.request = drf_request
+    etag = await sync_to_async(view.get_list_etag)(drf_request)
+    response = not_modified(request, etag)
+    if response is None:
+        data = await sync_to_async(view.get_list_data)(drf_request)
+        response = json_response(data)
+    return set_validators(response, etag)
+
+
+async def current_user(request):
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+    return json_response({
+        'id': user.id,
+        'username': user.username,
+    })
+
+
+# Интервал комментариев-пингов, чтобы прокси не закрывали простаивающее соединение
+EVENTS_HEARTBEAT_SECONDS = 15
+
+
+async def application_status_events(user):
+    pubsub = get_async_redis().pubsub()
+    await pubsub.subscribe(APPLICATION_STATUS_CHANNEL)
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=EVENTS_HEARTBEAT_SECONDS)
+            if message is None:
+                yield ': ping\n\n'
+                continue
+            event = json.loads(message['data'])
+            # Пользователь видит только свои заявки, модератор - все
+            if not user.is_staff and int(event['user']) != int(user.id):
+                continue
+            yield f"event: status\nid: {event['application']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        await pubsub.reset()
+
+
+async def application_events(request):
+    """
+    SSE-поток смен статусов заявок вместо опроса GET /api/applications/.
+    """
+    try:
+        user = await authenticate_stream(request)
+    except AuthenticationFailed as exc:
+        return unauthorized(exc)
+    if user is None:
+        return unauthorized()
+
+    response = StreamingHttpResponse(application_status_events(user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+service_list_view = async_read_view(service_list, ServiceAPIView.as_view())
+application_list_view = async_read_view(application_list, ApplicationAPIView.as_view())
+current_user_view = async_read_view(current_user, CurrentUserAPIView.as_view())
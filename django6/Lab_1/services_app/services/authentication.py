@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+# Короткий TTL: кэш нужен только путям, которым нужна полная модель пользователя
+USER_CACHE_TIMEOUT = 60
+
+
+def user_cache_key(user_id):
+    return f"user_{user_id}"
+
+
+def get_cached_user(user_id):
+    """
+    Полная модель пользователя из Redis, при промахе - из БД.
+    """
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.filter(pk=user_id, is_active=True).first()
+        if user is not None:
+            cache.set(key, user, timeout=USER_CACHE_TIMEOUT)
+    return user
+
+
+class CachedTokenUser(TokenUser):
+    """
+    Пользователь, собранный из claims access-токена без запроса к БД.
+    Для старых токенов без claims и для полной модели используется кэш пользователей.
+    """
+
+    @cached_property
+    def id(self):
+        # simplejwt кладёт id пользователя в токен строкой, а проверки владельца сравнивают с user_id
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def instance(self):
+        return get_cached_user(self.id)
+
+    @cached_property
+    def username(self):
+        if 'username' in self.token:
+            return self.token['username']
+        return self.instance.username if self.instance else ''
+
+    @cached_property
+    def is_staff(self):
+        if 'is_staff' in self.token:
+            return self.token['is_staff']
+        return bool(self.instance and self.instance.is_staff)
+
+    @cached_property
+    def is_superuser(self):
+        if 'is_superuser' in self.token:
+            return self.token['is_superuser']
+        return bool(self.instance and self.instance.is_superuser)
@@ -0,0 +1,284 @@
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django_redis import get_redis_connection
+
+from .renderers import ORJSONRenderer
+
+# Ключ счётчика поколений списка услуг
+SERVICE_LIST_VERSION_KEY = 'service_list_version'
+
+# Кэш инвалидируется сменой поколения, поэтому TTL можно держать большим
+SERVICE_LIST_TIMEOUT = 60 * 60 * 6
+
+
+# Локальный (L1) кэш каталога в памяти процесса перед Redis
+CATALOG_L1_MAX_SIZE = 256
+# Страховка на случай пропущенного сообщения об инвалидации
+CATALOG_L1_TIMEOUT = 30
+# Канал Redis pub/sub, по которому все процессы сбрасывают L1 при изменении услуг
+CATALOG_INVALIDATION_CHANNEL = 'catalog_invalidate'
+
+
+class LocalCache:
+    """
+    Потокобезопасный LRU-кэш с TTL в памяти процесса.
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+catalog_l1 = LocalCache(CATALOG_L1_MAX_SIZE, CATALOG_L1_TIMEOUT)
+
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+# Наибольшее известное процессу поколение списка услуг (из Redis или из сообщения об инвалидации).
+# Чтение из Redis, начатое до смены поколения, не должно вернуть в L1 старое значение
+_latest_version = 0
+_version_lock = threading.Lock()
+
+
+def remember_service_list_version(version):
+    """
+    Кладёт прочитанное поколение в L1, если оно не старше известного; возвращает актуальное.
+    """
+    global _latest_version
+    with _version_lock:
+        if version >= _latest_version:
+            _latest_version = version
+            catalog_l1.set(SERVICE_LIST_VERSION_KEY, version)
+        return _latest_version
+
+
+def apply_catalog_invalidation(message=None):
+    global _latest_version
+    with _version_lock:
+        try:
+            _latest_version = max(_latest_version, int(message['data']))
+        except (TypeError, ValueError):
+            pass
+        catalog_l1.clear()
+
+
+def listen_catalog_invalidations():
+    while True:
+        try:
+            pubsub = get_redis_connection('default').pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CATALOG_INVALIDATION_CHANNEL)
+            # Пока подписки не было, сообщения могли потеряться
+            apply_catalog_invalidation()
+            for message in pubsub.listen():
+                apply_catalog_invalidation(message)
+        except Exception:
+            apply_catalog_invalidation()
+            time.sleep(1)
+
+
+def ensure_invalidation_listener():
+    """
+    Запускает фоновый поток подписки один раз на процесс (и заново после fork).
+    """
+    global _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        catalog_l1.clear()
+        threading.Thread(target=listen_catalog_invalidations, name='catalog-invalidation', daemon=True).start()
+        _listener_pid = os.getpid()
+
+
+def catalog_set(key, value, timeout):
+    cache.set(key, value, timeout=timeout)
+    catalog_l1.set(key, value)
+
+
+def get_service_list_version():
+    """
+    Текущее поколение кэша списка услуг.
+    """
+    ensure_invalidation_listener()
+    version = catalog_l1.get(SERVICE_LIST_VERSION_KEY)
+    if version is None:
+        version = cache.get(SERVICE_LIST_VERSION_KEY)
+        if version is None:
+            # Начинаем со времени, чтобы после вытеснения ключа не вернуться к старому поколению
+            cache.add(SERVICE_LIST_VERSION_KEY, int(time.time() * 1000), timeout=None)
+            version = cache.get(SERVICE_LIST_VERSION_KEY)
+        version = remember_service_list_version(version)
+    return version
+
+
+def bump_service_list_version():
+    """
+    Инвалидирует все варианты списка услуг за O(1): старые ключи просто перестают читаться
+    и истекают сами по TTL. L1 всех процессов сбрасывается через pub/sub,
+    в сообщении - новое поколение.
+    """
+    try:
+        version = cache.incr(SERVICE_LIST_VERSION_KEY)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(SERVICE_LIST_VERSION_KEY, version, timeout=None)
+    apply_catalog_invalidation({'data': version})
+    get_redis_connection('default').publish(CATALOG_INVALIDATION_CHANNEL, version)
+
+
+# Защита от «эффекта толпы» при истечении ключа: пересчитывает один процесс (lock с арендой),
+# остальные отдают старое значение; ключ обновляется досрочно с вероятностью,
+# растущей к концу TTL (XFetch)
+RECOMPUTE_LOCK_TIMEOUT = 10
+# Сколько после логического истечения ключ ещё живёт в Redis как «старое значение»
+STALE_GRACE_TIMEOUT = 60 * 5
+XFETCH_BETA = 1.0
+RECOMPUTE_WAIT_INTERVAL = 0.05
+
+
+def is_fresh(record):
+    """
+    XFetch: чем ближе истечение и дольше пересчёт (delta), тем вероятнее досрочное обновление.
+    """
+    early = record['delta'] * XFETCH_BETA * -math.log(1.0 - random.random())
+    return time.time() + early < record['expires_at']
+
+
+def recompute_and_store(key, recompute, timeout):
+    started = time.time()
+    value = recompute()
+    finished = time.time()
+    record = {'value': value, 'expires_at': finished + timeout, 'delta': finished - started}
+    catalog_set(key, record, timeout=timeout + STALE_GRACE_TIMEOUT)
+    return value
+
+
+def read_shared_record(key):
+    """
+    Запись из Redis в обход L1 (и обновление L1 ею).
+    """
+    record = cache.get(key)
+    if record is not None:
+        catalog_l1.set(key, record)
+    return record
+
+
+def get_or_recompute(key, recompute, timeout):
+    """
+    Значение ключа каталога; при истечении его пересчитывает только один запрос.
+    """
+    ensure_invalidation_listener()
+    record = catalog_l1.get(key)
+    if record is not None and is_fresh(record):
+        return record['value']
+    # Копия в L1 могла устареть, пока другой процесс уже обновил ключ: смотрим в Redis
+    record = read_shared_record(key)
+    if record is not None and is_fresh(record):
+        return record['value']
+
+    lock_key = f"{key}_lock"
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, timeout=RECOMPUTE_LOCK_TIMEOUT):
+        try:
+            # Lock мог освободиться сразу после чужого пересчёта
+            fresh = read_shared_record(key)
+            if fresh is not None and is_fresh(fresh):
+                return fresh['value']
+            return recompute_and_store(key, recompute, timeout)
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    # Пересчёт уже идёт в другом запросе: отдаём старое значение, если оно есть
+    if record is not None:
+        return record['value']
+
+    # Холодный промах: ждём результат победителя не дольше аренды lock
+    deadline = time.time() + RECOMPUTE_LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(RECOMPUTE_WAIT_INTERVAL)
+        record = read_shared_record(key)
+        if record is not None:
+            return record['value']
+    return recompute_and_store(key, recompute, timeout)
+
+
+# GET-параметры, от которых зависит список услуг; остальные не должны плодить ключи
+SERVICE_LIST_PARAMS = ('name', 'q', 'cursor', 'page_size')
+
+
+def service_list_params(query_params):
+    """
+    Нормализованные (отсортированные) GET-параметры списка услуг из SERVICE_LIST_PARAMS.
+    """
+    return sorted(
+        (name, value)
+        for name in SERVICE_LIST_PARAMS
+        for value in query_params.getlist(name)
+    )
+
+
+def service_list_cache_key(query_params, version=None):
+    """
+    Ключ списка услуг: поколение + нормализованные параметры фильтра и страницы.
+    """
+    if version is None:
+        version = get_service_list_version()
+    return f"service_list_v{version}_{urlencode(service_list_params(query_params))}"
+
+
+def make_cached_body(data):
+    """
+    Рендерит общую часть ответа один раз; дальше из кэша отдаются готовые байты.
+    """
+    return {
+        'body': ORJSONRenderer().render(data),
+        'content_type': 'application/json',
+    }
+
+
+def overlay_response(entry, **overlay):
+    """
+    Собирает ответ из закэшированных байтов объекта и небольших пользовательских полей
+    без json.loads/json.dumps: поля дописываются сразу после открывающей скобки.
+    """
+    prefix = ''.join(
+        f'{json.dumps(key)}:{json.dumps(value)},' for key, value in overlay.items()
+    ).encode()
+    return HttpResponse(b'{' + prefix + entry['body'][1:], content_type=entry['content_type'])
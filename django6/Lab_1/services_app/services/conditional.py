@@ -0,0 +1,26 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+# Условные GET: валидаторы считаются из дешёвых данных (поколение кэша, max(updated_at)),
+# поэтому 304 отдаётся до выборки строк и сериализации
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Ответ 304, если у клиента актуальная версия, иначе None.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
@@ -0,0 +1,26 @@
+import json
+
+from django_redis import get_redis_connection
+
+# Канал Redis pub/sub со сменами статусов заявок
+APPLICATION_STATUS_CHANNEL = 'application_status'
+
+
+def publish_status_changes(changes):
+    """
+    Публикует смены статусов заявок для SSE-подписчиков (/api/applications/events/).
+    changes - пары (application_id, user_id, old_status, new_status); отправка одним pipeline.
+    """
+    pipeline = get_redis_connection('default').pipeline(transaction=False)
+    for application_id, user_id, old_status, new_status in changes:
+        pipeline.publish(APPLICATION_STATUS_CHANNEL, json.dumps({
+            'application': application_id,
+            'user': user_id,
+            'old_status': old_status,
+            'status': new_status,
+        }))
+    pipeline.execute()
+
+
+def publish_status_change(application_id, user_id, old_status, new_status):
+    publish_status_changes([(application_id, user_id, old_status, new_status)])
@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_service_list_version
+from .models import Service
+
+# Импорт каталога услуг: строки читаются потоком и пишутся пачками по ключу name
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_FIELDS = ('description', 'image')
+CATALOG_FORMATS = ('csv', 'json', 'jsonl')
+
+url_validator = URLValidator()
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension == 'ndjson':
+        return 'jsonl'
+    return extension if extension in CATALOG_FORMATS else None
+
+
+def read_catalog(stream, catalog_format):
+    """
+    Строки каталога из бинарного потока. CSV и JSON Lines читаются построчно,
+    JSON - массив объектов целиком.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    if catalog_format == 'csv':
+        yield from csv.DictReader(text)
+    elif catalog_format == 'jsonl':
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        rows = json.load(text)
+        if not isinstance(rows, list):
+            raise ValueError('JSON catalog must be an array of objects.')
+        yield from rows
+
+
+def validate_row(row):
+    if not isinstance(row, dict):
+        return None, {'row': 'Expected an object.'}
+    errors = {}
+    name = str(row.get('name') or '').strip()
+    if not name:
+        errors['name'] = 'This field is required.'
+    elif len(name) > Service._meta.get_field('name').max_length:
+        errors['name'] = 'Ensure this field has no more than 100 characters.'
+    image = str(row.get('image') or '').strip()
+    try:
+        url_validator(image)
+    except ValidationError:
+        errors['image'] = 'Enter a valid URL.'
+    values = {'name': name, 'description': str(row.get('description') or ''), 'image': image}
+    return values, errors
+
+
+def import_batch(batch, report):
+    # Повторы имени внутри пачки: побеждает последняя строка
+    rows = {}
+    for number, row in batch:
+        values, errors = validate_row(row)
+        if errors:
+            report['errors'].append({'row': number, 'errors': errors})
+        else:
+            rows[values['name']] = values
+
+    # При нескольких услугах с одним именем обновляется самая ранняя
+    existing = {}
+    for service in Service.objects.filter(name__in=list(rows)).order_by('-id'):
+        existing[service.name] = service
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    for name, values in rows.items():
+        service = existing.get(name)
+        if service is None:
+            to_create.append(Service(**values))
+            report['created'].append(name)
+            continue
+        changed = [field for field in IMPORT_FIELDS if getattr(service, field) != values[field]]
+        if service.is_deleted:
+            changed.append('is_deleted')
+        if not changed:
+            report['unchanged'] += 1
+            continue
+        for field in IMPORT_FIELDS:
+            setattr(service, field, values[field])
+        service.is_deleted = False
+        service.updated_at = now
+        to_update.append(service)
+        report['updated'].append({'name': name, 'fields': changed})
+
+    Service.objects.bulk_create(to_create, batch_size=IMPORT_BATCH_SIZE)
+    Service.objects.bulk_update(to_update, [*IMPORT_FIELDS, 'is_deleted', 'updated_at'], batch_size=IMPORT_BATCH_SIZE)
+
+
+def import_services(rows):
+    """
+    Создаёт и обновляет услуги по имени, возвращает отчёт об изменениях.
+    Весь импорт - одна транзакция и одна инвалидация кэша списка услуг.
+    """
+    report = {'created': [], 'updated': [], 'unchanged': 0, 'errors': []}
+    with transaction.atomic():
+        batch = []
+        for number, row in enumerate(rows, start=1):
+            batch.append((number, row))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                import_batch(batch, report)
+                batch = []
+        if batch:
+            import_batch(batch, report)
+        # bulk-операции не вызывают сигналы Service, поэтому кэш сбрасываем сами, один раз
+        if report['created'] or report['updated']:
+            transaction.on_commit(bump_service_list_version)
+    return report
@@ -0,0 +1,33 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.importers import CATALOG_FORMATS, detect_format, import_services, read_catalog
+
+
+class Command(BaseCommand):
+    help = 'Импортирует каталог услуг из CSV/JSON/JSON Lines (ключ - name)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл каталога с колонками name, description, image')
+        parser.add_argument('--format', choices=CATALOG_FORMATS, help='Формат файла; по умолчанию - по расширению')
+
+    def handle(self, *args, **options):
+        catalog_format = options['format'] or detect_format(options['path'])
+        if catalog_format is None:
+            raise CommandError('Не удалось определить формат файла, укажите --format')
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = import_services(read_catalog(stream, catalog_format))
+        except (OSError, ValueError, csv.Error) as exc:
+            raise CommandError(f'Импорт не выполнен: {exc}')
+
+        for item in report['updated']:
+            self.stdout.write(f"~ {item['name']}: {', '.join(item['fields'])}")
+        for error in report['errors']:
+            self.stderr.write(f"! строка {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано: {len(report['created'])}, обновлено: {len(report['updated'])}, "
+            f"без изменений: {report['unchanged']}, ошибок: {len(report['errors'])}"
+        ))
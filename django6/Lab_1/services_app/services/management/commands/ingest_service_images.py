@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from services.cache import bump_service_list_version
+from services.models import Service
+from services.thumbnails import ImageIngestError, ingest_service_image
+
+
+class Command(BaseCommand):
+    help = 'Скачивает картинки услуг в хранилище и генерирует WebP-миниатюры'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Обработать заново и уже скачанные картинки')
+
+    def handle(self, *args, **options):
+        services = Service.objects.filter(is_deleted=False)
+        if not options['all']:
+            # Только новые услуги и услуги, у которых сменился URL картинки
+            services = services.exclude(image_ingested_from=F('image'))
+
+        processed = failed = 0
+        for service in services.only('id', 'image').iterator():
+            try:
+                ingest_service_image(service)
+                processed += 1
+            except ImageIngestError as exc:
+                failed += 1
+                self.stderr.write(f'! услуга #{service.pk} ({service.image}): {exc}')
+
+        # Миниатюры попадают в список услуг, поэтому сбрасываем его кэш один раз за прогон
+        if processed:
+            bump_service_list_version()
+        self.stdout.write(self.style.SUCCESS(f'Обработано: {processed}, ошибок: {failed}'))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+STATS_VIEWS = [
+    'services_applicationdailystats',
+    'services_applicationcompletionstats',
+]
+
+
+class Command(BaseCommand):
+    help = 'Обновляет материализованные представления статистики заявок (/api/stats/)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Обновлять в цикле раз в N секунд (фоновый процесс); по умолчанию - один раз',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.refresh()
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def refresh(self):
+        # CONCURRENTLY не блокирует чтение /api/stats/ на время пересчёта
+        with connection.cursor() as cursor:
+            for view in STATS_VIEWS:
+                cursor.execute(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {view}')
+        self.stdout.write(self.style.SUCCESS('Статистика заявок обновлена'))
@@ -0,0 +1,26 @@
+from rest_framework.permissions import SAFE_METHODS
+
+from .routers import pin_to_primary, replica_configured
+
+
+class PrimaryPinMiddleware:
+    """
+    Закрепляет пользователя за основной БД после успешного изменяющего запроса,
+    чтобы следующие чтения не попали на отстающую реплику.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            replica_configured()
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+        ):
+            # DRF записывает аутентифицированного (в т.ч. по JWT) пользователя и в request.user
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user)
+        return response
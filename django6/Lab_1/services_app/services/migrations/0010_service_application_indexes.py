@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:00
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def deduplicate_drafts(apps, schema_editor):
+    # Перед уникальным индексом оставляем у каждого пользователя только последний черновик
+    Application = apps.get_model('services', 'Application')
+    seen_users = set()
+    drafts = Application.objects.filter(status='draft', is_deleted=False).order_by('user_id', '-created_at', '-id')
+    for application_id, user_id in drafts.values_list('id', 'user_id'):
+        if user_id in seen_users:
+            Application.objects.filter(pk=application_id).update(is_deleted=True)
+        seen_users.add(user_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0009_alter_application_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(deduplicate_drafts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['id'], name='service_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='service_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'status'], name='application_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at', '-id'], name='application_active_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='application',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_deleted', False), ('status', 'draft')), fields=('user',), name='application_one_draft_per_user'),
+        ),
+    ]
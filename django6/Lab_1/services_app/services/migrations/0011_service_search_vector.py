@@ -0,0 +1,54 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:30
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Вектор пересчитывается триггером, поэтому его поддерживают и bulk_create/update(),
+# которые не вызывают сигналы
+SEARCH_VECTOR_EXPRESSION = """
+    setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B')
+"""
+
+CREATE_TRIGGER = f"""
+CREATE OR REPLACE FUNCTION services_service_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {SEARCH_VECTOR_EXPRESSION};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER services_service_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON services_service
+    FOR EACH ROW EXECUTE FUNCTION services_service_search_vector_update();
+
+UPDATE services_service SET name = name;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS services_service_search_vector_trigger ON services_service;
+DROP FUNCTION IF EXISTS services_service_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0010_service_application_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='service_search_vector_idx'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
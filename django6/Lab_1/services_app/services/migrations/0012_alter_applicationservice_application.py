@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0011_service_search_vector'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='applicationservice',
+            name='application',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='application_services', to='services.application'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+def fill_services_summary(apps, schema_editor):
+    Application = apps.get_model('services', 'Application')
+    ApplicationService = apps.get_model('services', 'ApplicationService')
+    summaries = {}
+    rows = ApplicationService.objects.order_by('application_id', 'id').values_list('application_id', 'service_id', 'service__name')
+    for application_id, service_id, name in rows.iterator():
+        summaries.setdefault(application_id, []).append({'id': service_id, 'name': name})
+    for application_id, summary in summaries.items():
+        Application.objects.filter(pk=application_id).update(service_count=len(summary), services_summary=summary)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0013_service_updated_at_application_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='service_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='services_summary',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(fill_services_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+# Представления обновляются REFRESH MATERIALIZED VIEW CONCURRENTLY (команда refresh_application_stats),
+# для этого у каждого нужен уникальный индекс
+CREATE_VIEWS = """
+CREATE MATERIALIZED VIEW services_applicationdailystats AS
+SELECT
+    row_number() OVER (ORDER BY day, status, moderator_id) AS id,
+    day, status, moderator_id, total
+FROM (
+    SELECT
+        (created_at AT TIME ZONE 'UTC')::date AS day,
+        status,
+        COALESCE(moderator_id, 0) AS moderator_id,
+        count(*) AS total
+    FROM services_application
+    WHERE NOT is_deleted
+    GROUP BY 1, 2, 3
+) AS grouped;
+
+CREATE UNIQUE INDEX services_applicationdailystats_key
+    ON services_applicationdailystats (day, status, moderator_id);
+
+CREATE MATERIALIZED VIEW services_applicationcompletionstats AS
+SELECT
+    1 AS id,
+    count(*) AS completed,
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY extract(epoch FROM completed_at - created_at))
+        AS median_completion_seconds,
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY extract(epoch FROM completed_at - generated_at))
+        FILTER (WHERE generated_at IS NOT NULL) AS median_processing_seconds,
+    now() AS refreshed_at
+FROM services_application
+WHERE NOT is_deleted AND status = 'completed' AND completed_at IS NOT NULL;
+
+CREATE UNIQUE INDEX services_applicationcompletionstats_key
+    ON services_applicationcompletionstats (id);
+"""
+
+DROP_VIEWS = """
+DROP MATERIALIZED VIEW IF EXISTS services_applicationcompletionstats;
+DROP MATERIALIZED VIEW IF EXISTS services_applicationdailystats;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0014_application_service_count_services_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationCompletionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed', models.PositiveIntegerField()),
+                ('median_completion_seconds', models.FloatField(null=True)),
+                ('median_processing_seconds', models.FloatField(null=True)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'services_applicationcompletionstats',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ApplicationDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('moderator_id', models.BigIntegerField()),
+                ('total', models.PositiveIntegerField()),
+            ],
+            options={
+                'db_table': 'services_applicationdailystats',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CREATE_VIEWS, DROP_VIEWS),
+    ]
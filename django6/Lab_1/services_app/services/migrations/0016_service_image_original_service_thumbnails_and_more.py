@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0015_application_stats_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='image_original',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='image_ingested_from',
+            field=models.URLField(blank=True, editable=False),
+        ),
+    ]
@@ -1,15 +1,46 @@
-from django.db import models
+from django.db import connection, models
 from django.contrib.auth.models import AbstractUser, User
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Now, Upper
 
 class Service(models.Model):
     name = models.CharField(max_length=100)
     image = models.URLField()
     description = models.TextField()
     is_deleted = models.BooleanField(default=False) 
+    updated_at = models.DateTimeField(auto_now=True)
+    # Копия картинки и WebP-миниатюры в хранилище (имена файлов), см. services/thumbnails.py
+    image_original = models.CharField(max_length=255, blank=True, editable=False)
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
+    # URL, с которого скачана текущая копия; отличие от image значит, что копию пора обновить
+    image_ingested_from = models.URLField(blank=True, editable=False)
+    # Заполняется триггером БД (русская и английская конфигурации), см. миграцию 0011
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Каталог читает только неудалённые услуги
+            models.Index(fields=['id'], condition=models.Q(is_deleted=False), name='service_active_idx'),
+            # Триграммный индекс для поиска по похожести названия (pg_trgm)
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='service_name_trgm_idx'),
+            # name__icontains Django строит как UPPER(name::text) LIKE UPPER('%q%'),
+            # поэтому для фильтра ?name= нужен индекс по тому же выражению
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='service_name_upper_trgm_idx'),
+            GinIndex(fields=['search_vector'], name='service_search_vector_idx'),
+        ]
    
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Загруженное название нужно сигналу переименования; отложенное поле не читаем (лишний запрос)
+        if 'name' not in instance.get_deferred_fields():
+            instance._loaded_name = instance.name
+        return instance
+
 class Application(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Черновик'),
@@ -26,16 +57,147 @@ class Application(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     is_deleted = models.BooleanField(default=False)
+    # Обновляется и при изменении состава услуг заявки, см. refresh_services_summary
+    updated_at = models.DateTimeField(auto_now=True)
+    # Денормализованный состав заявки: список [{id, name}] для дашбордов без join
+    service_count = models.PositiveIntegerField(default=0, editable=False)
+    services_summary = models.JSONField(default=list, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Поиск черновика пользователя и список заявок пользователя
+            models.Index(fields=['user', 'status'], condition=models.Q(is_deleted=False),
+                         name='application_user_status_idx'),
+            # Список заявок для модераторов в порядке пагинации
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_deleted=False),
+                         name='application_active_idx'),
+            # max(updated_at) для ETag списка заявок (пользователя и модератора), включая удалённые
+            models.Index(fields=['user', 'updated_at'], name='application_user_updated_idx'),
+            models.Index(fields=['updated_at'], name='application_updated_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user'], condition=models.Q(status='draft', is_deleted=False),
+                                    name='application_one_draft_per_user'),
+        ]
 
     def __str__(self):
         return f"Заявка #{self.pk} от {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Загруженный статус нужен сигналу смены статуса; отложенное поле не читаем (лишний запрос)
+        if 'status' not in instance.get_deferred_fields():
+            instance._loaded_status = instance.status
+        return instance
+
+    @classmethod
+    def refresh_services_summary(cls, application_id):
+        """
+        Пересчитывает service_count и services_summary и сдвигает updated_at.
+        Вызывается в транзакции, меняющей состав услуг; строка заявки блокируется,
+        чтобы параллельные изменения не затёрли друг друга.
+        """
+        list(cls.objects.select_for_update().filter(pk=application_id).values_list('id', flat=True))
+        summary = [
+            {'id': service_id, 'name': name}
+            for service_id, name in ApplicationService.objects.filter(application_id=application_id)
+            .order_by('id').values_list('service_id', 'service__name')
+        ]
+        cls.objects.filter(pk=application_id).update(
+            service_count=len(summary),
+            services_summary=summary,
+            updated_at=Now(),
+        )
+
+    @classmethod
+    def rename_service_in_summaries(cls, service_id, name):
+        """
+        Переписывает название услуги в services_summary всех заявок с ней одним UPDATE (jsonb).
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {cls._meta.db_table} SET
+                    services_summary = COALESCE((
+                        SELECT jsonb_agg(
+                            CASE WHEN (item->>'id')::bigint = %s
+                                THEN jsonb_set(item, '{{name}}', to_jsonb(%s::text))
+                                ELSE item END
+                            ORDER BY position
+                        )
+                        FROM jsonb_array_elements(services_summary) WITH ORDINALITY AS items(item, position)
+                    ), '[]'::jsonb),
+                    updated_at = now()
+                WHERE id IN (
+                    SELECT application_id FROM {ApplicationService._meta.db_table} WHERE service_id = %s
+                )
+                """,
+                [service_id, name, service_id],
+            )
+
+    @classmethod
+    def remove_service_from_summaries(cls, service_id):
+        """
+        Убирает услугу из service_count/services_summary всех заявок с ней одним UPDATE.
+        Вызывается до жёсткого удаления услуги, пока её строки ApplicationService ещё есть.
+        """
+        application_services = ApplicationService._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {cls._meta.db_table} AS application SET
+                    services_summary = COALESCE((
+                        SELECT jsonb_agg(item ORDER BY position)
+                        FROM jsonb_array_elements(services_summary) WITH ORDINALITY AS items(item, position)
+                        WHERE (item->>'id')::bigint <> %s
+                    ), '[]'::jsonb),
+                    service_count = (
+                        SELECT count(*) FROM {application_services}
+                        WHERE application_id = application.id AND service_id <> %s
+                    ),
+                    updated_at = now()
+                WHERE id IN (SELECT application_id FROM {application_services} WHERE service_id = %s)
+                """,
+                [service_id, service_id, service_id],
+            )
+
 class ApplicationService(models.Model):
-    application = models.ForeignKey(Application, on_delete=models.CASCADE)
+    application = models.ForeignKey(Application, related_name='application_services', on_delete=models.CASCADE)
     service = models.ForeignKey(Service, on_delete=models.CASCADE)
 
     class Meta:
         unique_together = ('application', 'service')
 
     def __str__(self):
-        return f"Заявка #{self.application.pk} - Услуга: {self.service.name}"
\ No newline at end of file
+        return f"Заявка #{self.application.pk} - Услуга: {self.service.name}"
+
+
+class ApplicationDailyStats(models.Model):
+    """
+    Материализованное представление: число заявок по дню, статусу и модератору.
+    Обновляется командой refresh_application_stats, см. миграцию 0015.
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+    # 0 - модератор не назначен (в уникальном индексе представления не может быть NULL)
+    moderator_id = models.BigIntegerField()
+    total = models.PositiveIntegerField()
+
+    class Meta:
+        managed = False
+        db_table = 'services_applicationdailystats'
+
+
+class ApplicationCompletionStats(models.Model):
+    """
+    Материализованное представление из одной строки: медианы времени обработки заявок.
+    """
+    completed = models.PositiveIntegerField()
+    median_completion_seconds = models.FloatField(null=True)
+    median_processing_seconds = models.FloatField(null=True)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'services_applicationcompletionstats'
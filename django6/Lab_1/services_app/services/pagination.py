@@ -0,0 +1,44 @@
+from urllib.parse import urlencode
+
+from rest_framework.pagination import CursorPagination
+
+from .cache import service_list_params
+
+# Курсорная (keyset) пагинация: страница выбирается условием по ключу сортировки,
+# а не OFFSET, поэтому стоимость и память не зависят от номера страницы
+
+
+class ServiceCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        # Результаты поиска (ServiceFilter.search) идут по релевантности
+        if 'rank' in queryset.query.annotations:
+            return ('-rank', 'id')
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super().paginate_queryset(queryset, request, view=view)
+        # Страница кэшируется общей для всех, поэтому ссылки next/previous относительные
+        # и только из параметров ключа кэша, без хоста и лишних параметров первого запроса
+        params = [(name, value) for name, value in service_list_params(request.query_params) if name != 'cursor']
+        self.base_url = f"{request.path}?{urlencode(params)}"
+        return page
+
+
+class ApplicationCursorPagination(CursorPagination):
+    # Новые заявки первыми; id разрешает совпадения created_at
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class IdCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+# Чтение с реплики включается явно (ReplicaReadMixin) на время обработки запроса
+_use_replica = ContextVar('use_replica', default=False)
+
+REPLICA_DATABASE = 'replica'
+
+
+def replica_configured():
+    # Соединение с репликой открывается лениво, пока READ_REPLICA выключен, его нет
+    return settings.READ_REPLICA and REPLICA_DATABASE in settings.DATABASES
+
+
+def primary_pin_key(user_id):
+    return f"db_primary_pin_{user_id}"
+
+
+def pin_to_primary(user):
+    """
+    После записи пользователь REPLICA_STICKY_SECONDS читает с основной БД (read-your-writes).
+    """
+    cache.set(primary_pin_key(user.id), 1, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    return user.is_authenticated and cache.get(primary_pin_key(user.id)) is not None
+
+
+@contextmanager
+def primary_reads():
+    """
+    Чтения внутри блока идут в основную БД, даже если запрос читает с реплики.
+    Нужно для данных, которые кладутся в общий кэш: отстающая реплика закэшировала бы старое.
+    """
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_configured():
+            return REPLICA_DATABASE
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaReadMixin:
+    """
+    GET-запросы view читают с реплики, кроме пользователей, недавно писавших в БД.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if replica_configured() and request.method in SAFE_METHODS and not is_pinned_to_primary(request.user):
+            self._replica_token = _use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _use_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
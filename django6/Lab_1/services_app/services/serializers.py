@@ -1,13 +1,35 @@
 from rest_framework import serializers
 from .models import Service, Application, ApplicationService, User
 from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .authentication import get_cached_user
+
+
+def resolve_draft_application_id(request):
+    """
+    Возвращает id черновика текущего пользователя.
+    Результат запоминается на объекте запроса, поэтому БД опрашивается один раз за запрос.
+    """
+    if request is None or not request.user.is_authenticated:
+        return None
+    if not hasattr(request, '_draft_application_id'):
+        request._draft_application_id = Application.objects.filter(
+            user_id=request.user.id, status='draft', is_deleted=False
+        ).values_list('id', flat=True).first()
+    return request._draft_application_id
 
 class ServiceSerializer(serializers.ModelSerializer):
     draft_application_id = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = Service
-        fields = ['id', 'name', 'description', 'image', 'is_deleted', 'draft_application_id']
+        fields = ['id', 'name', 'description', 'image', 'thumbnails', 'is_deleted', 'draft_application_id']
         read_only_fields = ['is_deleted']
 
     def __init__(self, *args, **kwargs):
@@ -18,11 +40,23 @@ class ServiceSerializer(serializers.ModelSerializer):
                 self.fields[field].required = False
                 
     def get_draft_application_id(self, obj):
-        user = self.context['request'].user
-        if not user.is_authenticated:
-            return None
-        draft_application = Application.objects.filter(user=user, status='draft', is_deleted=False).first()
-        return draft_application.id if draft_application else None
+        # View передаёт черновик в контексте, чтобы не делать запрос на каждую услугу
+        if 'draft_application_id' in self.context:
+            return self.context['draft_application_id']
+        return resolve_draft_application_id(self.context['request'])
+
+    def get_thumbnails(self, obj):
+        # Ширина -> URL миниатюры в хранилище; пусто, пока картинка не обработана
+        return {width: default_storage.url(name) for width, name in obj.thumbnails.items()}
+
+class ServiceListSerializer(ServiceSerializer):
+    """
+    Услуга в общем списке: без пользовательских полей, чтобы кэш можно было делить между всеми.
+    """
+    draft_application_id = None
+
+    class Meta(ServiceSerializer.Meta):
+        fields = ['id', 'name', 'description', 'image', 'thumbnails', 'is_deleted']
 
 class ApplicationServiceSerializer(serializers.ModelSerializer):
     service = serializers.PrimaryKeyRelatedField(queryset=Service.objects.filter(is_deleted=False))
@@ -33,8 +67,41 @@ class ApplicationServiceSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['created_at', 'updated_at']
 
+class ApplicationServiceNestedSerializer(serializers.ModelSerializer):
+    """
+    Услуга внутри заявки; данные услуги берутся из select_related/Prefetch без доп. запросов.
+    """
+    service_name = serializers.CharField(source='service.name', read_only=True)
+    service_image = serializers.URLField(source='service.image', read_only=True)
+
+    class Meta:
+        model = ApplicationService
+        fields = ['id', 'service', 'service_name', 'service_image']
+        read_only_fields = fields
+
+class ServiceIdsSerializer(serializers.Serializer):
+    """
+    Список id услуг для пакетного добавления/удаления из черновика.
+    """
+    services = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500,
+    )
+
+class ModerationSerializer(serializers.Serializer):
+    """
+    Пакетное завершение/отклонение оформленных заявок модератором.
+    """
+    applications = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000,
+    )
+    status = serializers.ChoiceField(choices=['completed', 'rejected'])
+
 class ApplicationSerializer(serializers.ModelSerializer):
-    application_services = ApplicationServiceSerializer(many=True, read_only=True)
+    application_services = ApplicationServiceNestedSerializer(many=True, read_only=True)
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     moderator = serializers.PrimaryKeyRelatedField(read_only=True, allow_null=True)
 
@@ -51,6 +118,12 @@ class ApplicationSerializer(serializers.ModelSerializer):
             self.fields.pop('status', None)
             self.fields.pop('moderator', None)
 
+class ApplicationSummarySerializer(ApplicationSerializer):
+    """
+    Заявка для дашбордов: состав услуг берётся из денормализованных полей, без join.
+    """
+    application_services = None
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -92,4 +165,37 @@ class RegisterSerializer(serializers.ModelSerializer):
             password=validated_data['password'],
             email=validated_data.get('email', '')
         )
-        return user
\ No newline at end of file
+        return user
+
+def add_user_claims(token, user):
+    token['username'] = user.username
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    return token
+
+
+class TokenObtainPairWithClaimsSerializer(TokenObtainPairSerializer):
+    """
+    Кладёт в access-токен данные, нужные API, чтобы аутентификация обходилась без запроса к БД.
+    В refresh-токен claims не попадают, иначе они копировались бы в каждый обновлённый access-токен.
+    """
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = RefreshToken(data['refresh']).access_token
+        data['access'] = str(add_user_claims(access, self.user))
+        return data
+
+
+class TokenRefreshWithClaimsSerializer(TokenRefreshSerializer):
+    """
+    Claims нового access-токена читаются заново (кэш пользователей сбрасывается при сохранении),
+    поэтому изменение прав действует не позже, чем истечёт текущий access-токен.
+    """
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        user = get_cached_user(access[api_settings.USER_ID_CLAIM])
+        if user is None:
+            raise AuthenticationFailed('No active account found for the given token.')
+        data['access'] = str(add_user_claims(access, user))
+        return data
@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .authentication import user_cache_key
+from .cache import bump_service_list_version
+from .events import publish_status_change
+from .models import Application, Service, User
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_service_list(sender, instance, **kwargs):
+    # Мягкое удаление идёт через save(), поэтому post_save покрывает и его.
+    # Меняем поколение только после коммита, чтобы не закэшировать старые данные заново
+    transaction.on_commit(bump_service_list_version)
+
+
+@receiver(post_save, sender=Service)
+def refresh_renamed_service_summaries(sender, instance, created, **kwargs):
+    # Название услуги хранится в services_summary заявок, при переименовании переписываем его.
+    # Исходное название запоминает Service.from_db; не загруженное название не менялось
+    if created or 'name' in instance.get_deferred_fields():
+        return
+    if getattr(instance, '_loaded_name', None) == instance.name:
+        return
+    instance._loaded_name = instance.name
+    Application.rename_service_in_summaries(instance.pk, instance.name)
+
+
+@receiver(pre_delete, sender=Service)
+def remove_deleted_service_from_summaries(sender, instance, **kwargs):
+    # Жёсткое удаление (например, из админки) каскадно удаляет строки ApplicationService
+    # без пересчёта заявок, поэтому убираем услугу из их состава до удаления, одним UPDATE
+    Application.remove_service_from_summaries(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.pk))
+
+
+@receiver(post_save, sender=Application)
+def publish_application_status(sender, instance, created, **kwargs):
+    # Исходный статус запоминает Application.from_db; не загруженный статус не менялся
+    if not created and 'status' in instance.get_deferred_fields():
+        return
+    old_status = None if created else getattr(instance, '_loaded_status', None)
+    if old_status == instance.status:
+        return
+    instance._loaded_status = instance.status
+    transaction.on_commit(lambda: publish_status_change(
+        instance.pk, instance.user_id, old_status, instance.status
+    ))
@@ -1,2 +1,565 @@
-from django.test import TestCase
+import asyncio
+import io
+import tempfile
+import threading
+import time
+import uuid
+from functools import partial
+from unittest import mock, skipUnless
 
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import async_views
+from . import cache as catalog_cache
+from .authentication import CachedTokenUser
+from .cache import bump_service_list_version, catalog_l1, catalog_set, get_or_recompute
+from .events import publish_status_change
+from .importers import read_catalog
+from .models import Application, ApplicationService, Service
+from .routers import ReplicaRouter, primary_pin_key
+from .serializers import ServiceListSerializer, add_user_claims
+from .thumbnails import ImageIngestError, ingest_service_image
+
+
+def auth_headers(user):
+    token = add_user_claims(RefreshToken.for_user(user).access_token, user)
+    return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+
+def create_services(names):
+    return Service.objects.bulk_create(
+        Service(name=name, image=f'https://example.com/{index}.png', description=name)
+        for index, name in enumerate(names)
+    )
+
+
+class ServiceListQueriesTest(TestCase):
+    """
+    Число запросов GET /api/services/ не зависит от числа услуг на странице.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('client', password='client-password')
+        self.draft = Application.objects.create(user=self.user)
+
+    def get_list(self):
+        # Новое поколение кэша: страница строится из БД, а не берётся из Redis
+        bump_service_list_version()
+        response = self.client.get(reverse('service-list'), **auth_headers(self.user))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_queries_do_not_depend_on_service_count(self):
+        create_services(['Service 0'])
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get_list()
+        self.assertEqual(len(data['services']), 1)
+        self.assertEqual(data['draft_application_id'], self.draft.pk)
+
+        create_services([f'Service {index}' for index in range(1, 30)])
+        with self.assertNumQueries(len(queries)):
+            data = self.get_list()
+        self.assertEqual(len(data['services']), 30)
+        self.assertEqual(data['draft_application_id'], self.draft.pk)
+
+
+class ServiceListLinksTest(TestCase):
+    """
+    Ссылки страниц из общего кэша не зависят от хоста и лишних параметров первого запроса.
+    """
+
+    @override_settings(ALLOWED_HOSTS=['first-client.example'])
+    def test_links_are_relative_and_normalized(self):
+        create_services(['Service 0', 'Service 1', 'Service 2'])
+        bump_service_list_version()
+        response = self.client.get(reverse('service-list'), {'page_size': 2, 'utm_source': 'mail'},
+                                   HTTP_HOST='first-client.example')
+        self.assertEqual(response.status_code, 200)
+        next_link = response.json()['next']
+        self.assertTrue(next_link.startswith(reverse('service-list') + '?'))
+        self.assertIn('page_size=2', next_link)
+        self.assertIn('cursor=', next_link)
+        self.assertNotIn('utm_source', next_link)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Индексы и планы запросов PostgreSQL')
+class IndexUsageTest(TestCase):
+    """
+    Горячие запросы каталога и заявок идут по частичным и триграммным индексам.
+    """
+
+    def setUp(self):
+        create_services([f'Service {index}' for index in range(20)])
+        self.user = User.objects.create_user('client', password='client-password')
+        Application.objects.create(user=self.user)
+        # На маленькой тестовой таблице планировщик иначе выберет полный просмотр
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name):
+        self.assertIn(index_name, queryset.explain())
+
+    def test_service_list_uses_partial_index(self):
+        self.assertUsesIndex(Service.objects.filter(is_deleted=False).order_by('id')[:50], 'service_active_idx')
+
+    def test_service_name_filter_uses_trigram_index(self):
+        # Без is_deleted: иначе на маленькой таблице дешевле service_active_idx с фильтром
+        queryset = Service.objects.filter(name__icontains='vice 1')
+        self.assertUsesIndex(queryset, 'service_name_upper_trgm_idx')
+
+    def test_typo_search_uses_trigram_index(self):
+        self.assertUsesIndex(Service.objects.filter(name__trigram_similar='Servise'), 'service_name_trgm_idx')
+
+    def test_application_list_uses_partial_index(self):
+        queryset = Application.objects.filter(is_deleted=False).order_by('-created_at', '-id')[:50]
+        self.assertUsesIndex(queryset, 'application_active_idx')
+
+    def test_draft_lookup_uses_partial_index(self):
+        queryset = Application.objects.filter(user_id=self.user.pk, status='draft', is_deleted=False)
+        self.assertRegex(queryset.explain(), 'application_user_status_idx|application_one_draft_per_user')
+
+
+class ApplicationDraftConflictTest(TestCase):
+    """
+    Второй черновик пользователя через PUT модератора - 409, а не 500.
+    """
+
+    def test_staff_put_second_draft_returns_conflict(self):
+        owner = User.objects.create_user('client', password='client-password')
+        moderator = User.objects.create_user('moderator', password='moderator-password', is_staff=True)
+        Application.objects.create(user=owner)
+        formatted = Application.objects.create(user=owner, status='formatted')
+
+        response = self.client.put(
+            reverse('application-detail', args=[formatted.pk]), {'status': 'draft'},
+            content_type='application/json', **auth_headers(moderator),
+        )
+        self.assertEqual(response.status_code, 409)
+        formatted.refresh_from_db()
+        self.assertEqual(formatted.status, 'formatted')
+
+
+class ApplicationListQueriesTest(TestCase):
+    """
+    Услуги всех заявок страницы GET /api/applications/ грузятся одним Prefetch.
+    """
+
+    def setUp(self):
+        self.moderator = User.objects.create_user('moderator', password='moderator-password', is_staff=True)
+        self.services = create_services([f'Service {index}' for index in range(3)])
+
+    def create_applications(self, count):
+        for _ in range(count):
+            user = User.objects.create_user(f'client{Application.objects.count()}', password='client-password')
+            application = Application.objects.create(user=user, status='formatted', moderator=self.moderator)
+            ApplicationService.objects.bulk_create(
+                ApplicationService(application=application, service=service) for service in self.services
+            )
+
+    def get_list(self):
+        response = self.client.get(reverse('application-list'), **auth_headers(self.moderator))
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_queries_do_not_depend_on_application_count(self):
+        self.create_applications(1)
+        with CaptureQueriesContext(connection) as queries:
+            results = self.get_list()
+        self.assertEqual(len(results), 1)
+
+        self.create_applications(5)
+        with self.assertNumQueries(len(queries)):
+            results = self.get_list()
+        self.assertEqual(len(results), 6)
+        self.assertTrue(all(len(result['application_services']) == 3 for result in results))
+
+
+class ApplicationListValidatorsTest(TestCase):
+    """
+    Мягкое удаление заявки меняет ETag списка, 304 со старым списком не отдаётся.
+    """
+
+    def test_soft_delete_changes_etag(self):
+        user = User.objects.create_user('client', password='client-password')
+        application = Application.objects.create(user=user)
+        Application.objects.create(user=user, status='formatted')
+
+        response = self.client.get(reverse('application-list'), **auth_headers(user))
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+
+        application.is_deleted = True
+        application.save()
+        response = self.client.get(reverse('application-list'), HTTP_IF_NONE_MATCH=etag, **auth_headers(user))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+
+
+class ServiceRenameTest(TestCase):
+    """
+    Переименование услуги переписывает services_summary заявок одним запросом.
+    """
+
+    def test_rename_updates_summaries(self):
+        service, other = create_services(['Old name', 'Other'])
+        for index in range(3):
+            user = User.objects.create_user(f'client{index}', password='client-password')
+            application = Application.objects.create(user=user)
+            ApplicationService.objects.bulk_create([
+                ApplicationService(application=application, service=service),
+                ApplicationService(application=application, service=other),
+            ])
+            Application.refresh_services_summary(application.pk)
+
+        service = Service.objects.get(pk=service.pk)
+        service.name = 'New name'
+        # UPDATE услуги и один UPDATE заявок
+        with self.assertNumQueries(2):
+            service.save()
+
+        for summary in Application.objects.values_list('services_summary', flat=True):
+            self.assertEqual(summary, [{'id': service.pk, 'name': 'New name'}, {'id': other.pk, 'name': 'Other'}])
+
+    def test_hard_delete_updates_summaries(self):
+        service, other = create_services(['Removed', 'Other'])
+        user = User.objects.create_user('client', password='client-password')
+        application = Application.objects.create(user=user)
+        ApplicationService.objects.bulk_create([
+            ApplicationService(application=application, service=service),
+            ApplicationService(application=application, service=other),
+        ])
+        Application.refresh_services_summary(application.pk)
+
+        Service.objects.get(pk=service.pk).delete()
+
+        application.refresh_from_db()
+        self.assertEqual(application.service_count, 1)
+        self.assertEqual(application.services_summary, [{'id': other.pk, 'name': 'Other'}])
+
+    def test_deferred_name_is_not_loaded(self):
+        create_services(['Service'])
+        with self.assertNumQueries(1):
+            list(Service.objects.only('id', 'image'))
+
+
+class ServiceListVersionTest(SimpleTestCase):
+    """
+    Чтение поколения, начатое до смены, не возвращает в L1 старое поколение.
+    """
+
+    def test_stale_read_does_not_roll_back_l1(self):
+        old_version = catalog_cache.remember_service_list_version(catalog_cache._latest_version + 1)
+        # Сообщение о новом поколении пришло, пока другой поток читал старое из Redis
+        catalog_cache.apply_catalog_invalidation({'data': str(old_version + 1).encode()})
+        self.assertEqual(catalog_cache.remember_service_list_version(old_version), old_version + 1)
+        self.assertIsNone(catalog_cache.catalog_l1.get(catalog_cache.SERVICE_LIST_VERSION_KEY))
+
+
+class CatalogRecomputeTest(SimpleTestCase):
+    """
+    Истёкший ключ каталога пересчитывает один запрос, остальные ждут или отдают старое.
+    """
+    THREADS = 8
+    TIMEOUT = 60
+
+    def setUp(self):
+        self.key = f'test_catalog_{uuid.uuid4().hex}'
+        self.recomputes = 0
+        self.counter_lock = threading.Lock()
+        self.addCleanup(cache.delete, self.key)
+
+    def recompute(self):
+        with self.counter_lock:
+            self.recomputes += 1
+        time.sleep(0.2)
+        return 'new'
+
+    def store(self, value, expires_in):
+        record = {'value': value, 'expires_at': time.time() + expires_in, 'delta': 0.01}
+        catalog_set(self.key, record, timeout=self.TIMEOUT)
+
+    def run_concurrently(self):
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(get_or_recompute(self.key, self.recompute, self.TIMEOUT))
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_expired_key_is_recomputed_once(self):
+        self.store('old', expires_in=-1)
+        results = self.run_concurrently()
+        self.assertEqual(self.recomputes, 1)
+        self.assertEqual(len(results), self.THREADS)
+        self.assertTrue(set(results) <= {'old', 'new'})
+        self.assertEqual(get_or_recompute(self.key, self.recompute, self.TIMEOUT), 'new')
+        self.assertEqual(self.recomputes, 1)
+
+    def test_cold_key_is_recomputed_once(self):
+        results = self.run_concurrently()
+        self.assertEqual(self.recomputes, 1)
+        self.assertEqual(results, ['new'] * self.THREADS)
+
+    def test_stale_l1_copy_is_checked_against_redis(self):
+        # Другой процесс уже обновил ключ в Redis, а в L1 этого процесса - истёкшая копия
+        self.store('new', expires_in=self.TIMEOUT)
+        catalog_l1.set(self.key, {'value': 'old', 'expires_at': time.time() - 1, 'delta': 0.01})
+        self.assertEqual(get_or_recompute(self.key, self.recompute, self.TIMEOUT), 'new')
+        self.assertEqual(self.recomputes, 0)
+
+
+class OwnershipTest(TestCase):
+    """
+    Владелец без прав модератора работает со своими заявками по токену из /api/token/
+    (id пользователя в токене - строка).
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('client', password='client-password')
+        response = self.client.post(reverse('token_obtain_pair'),
+                                    {'username': 'client', 'password': 'client-password'})
+        self.headers = {'HTTP_AUTHORIZATION': f"Bearer {response.json()['access']}"}
+
+    def test_owner_adds_service_to_own_application(self):
+        service, = create_services(['Service'])
+        application = Application.objects.create(user=self.user)
+        response = self.client.post(reverse('application-service-list'),
+                                    {'application': application.pk, 'service': service.pk},
+                                    content_type='application/json', **self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(ApplicationService.objects.filter(application=application, service=service).exists())
+
+    def test_owner_deletes_own_application(self):
+        application = Application.objects.create(user=self.user)
+        response = self.client.delete(reverse('application-detail', args=[application.pk]), **self.headers)
+        self.assertEqual(response.status_code, 204)
+        application.refresh_from_db()
+        self.assertTrue(application.is_deleted)
+
+    def test_current_user_id_is_integer(self):
+        response = self.client.get(reverse('current-user'), **self.headers)
+        self.assertEqual(response.json()['id'], self.user.pk)
+
+
+class TokenClaimsTest(TestCase):
+    """
+    Claims пользователя есть только в access-токене и перечитываются при обновлении.
+    """
+
+    def test_refresh_rereads_claims(self):
+        moderator = User.objects.create_user('moderator', password='moderator-password', is_staff=True)
+        tokens = self.client.post(reverse('token_obtain_pair'),
+                                  {'username': 'moderator', 'password': 'moderator-password'}).json()
+        self.assertTrue(AccessToken(tokens['access'])['is_staff'])
+        self.assertNotIn('is_staff', RefreshToken(tokens['refresh']).payload)
+
+        moderator.is_staff = False
+        moderator.save()
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(AccessToken(response.json()['access'])['is_staff'])
+
+
+class ApplicationStatusEventsTest(SimpleTestCase):
+    """
+    Обычный пользователь получает по SSE смены статусов своих заявок и только их.
+    """
+
+    async def test_user_receives_own_status_change(self):
+        # Клиент redis.asyncio привязан к event loop, у теста свой loop
+        async_views._redis = None
+        token = AccessToken()
+        # simplejwt кладёт id пользователя строкой
+        token[api_settings.USER_ID_CLAIM] = '3'
+        token['is_staff'] = False
+        events = async_views.application_status_events(CachedTokenUser(token))
+        try:
+            self.assertEqual(await anext(events), 'retry: 5000\n\n')
+            publish_status_change(100, 4, 'draft', 'formatted')
+            publish_status_change(101, 3, 'draft', 'formatted')
+            event = await asyncio.wait_for(anext(events), timeout=5)
+            self.assertIn('id: 101\n', event)
+            self.assertIn('"status": "formatted"', event)
+        finally:
+            await events.aclose()
+            async_views._redis = None
+
+
+class ApplicationDeferredStatusTest(TestCase):
+    """
+    Загрузка заявок без поля status не читает его по запросу на строку.
+    """
+
+    def test_deferred_status_is_not_loaded(self):
+        for index in range(3):
+            user = User.objects.create_user(f'client{index}', password='client-password')
+            Application.objects.create(user=user)
+        with self.assertNumQueries(1):
+            list(Application.objects.only('id', 'user_id'))
+
+
+class ReadCatalogTest(SimpleTestCase):
+    """
+    JSON-каталог - только массив; остальное - ошибка каталога, а не 500 или мусорные строки.
+    """
+
+    def test_json_catalog_must_be_array(self):
+        for body in (b'123', b'{"name": "Service"}'):
+            with self.subTest(body=body), self.assertRaises(ValueError):
+                list(read_catalog(io.BytesIO(body), 'json'))
+
+    def test_json_array_is_read(self):
+        rows = list(read_catalog(io.BytesIO(b'[{"name": "Service"}]'), 'json'))
+        self.assertEqual(rows, [{'name': 'Service'}])
+
+
+def make_image_bytes(size=(800, 600)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 80, 40)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ServiceImageIngestTest(TestCase):
+    """
+    Картинка услуги сохраняется в хранилище (здесь - временный каталог) с WebP-миниатюрами.
+    """
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.storage = FileSystemStorage(location=tmpdir.name, base_url='/media/')
+        self.service, = create_services(['Service'])
+
+    def ingest(self, data):
+        with mock.patch('services.thumbnails.download_image', return_value=data):
+            return ingest_service_image(self.service, storage=self.storage)
+
+    def test_original_and_thumbnails_are_stored(self):
+        thumbnails = self.ingest(make_image_bytes())
+        self.assertEqual(set(thumbnails), {'200', '600'})
+        for width, name in thumbnails.items():
+            self.assertTrue(name.endswith(f'_{width}.webp'))
+            with self.storage.open(name) as stored, Image.open(stored) as thumbnail:
+                self.assertEqual(thumbnail.format, 'WEBP')
+                self.assertEqual(thumbnail.width, int(width))
+
+        self.service.refresh_from_db()
+        self.assertEqual(self.service.thumbnails, thumbnails)
+        self.assertTrue(self.service.image_original.endswith('.png'))
+        self.assertTrue(self.storage.exists(self.service.image_original))
+        self.assertEqual(self.service.image_ingested_from, self.service.image)
+
+    def test_rerun_reuses_content_hash_names(self):
+        data = make_image_bytes()
+        first = self.ingest(data)
+        with mock.patch.object(self.storage, 'save', wraps=self.storage.save) as save:
+            second = self.ingest(data)
+        self.assertEqual(first, second)
+        save.assert_not_called()
+
+    def test_bad_image_is_rejected(self):
+        with self.assertRaises(ImageIngestError):
+            self.ingest(b'not an image')
+        self.service.refresh_from_db()
+        self.assertEqual(self.service.thumbnails, {})
+
+    def test_command_counts_bad_image_as_failed(self):
+        good, = create_services(['Good'])
+        Service.objects.filter(pk=good.pk).update(image='https://example.com/good.png')
+        good.refresh_from_db()
+        images = {self.service.image: b'not an image', good.image: make_image_bytes()}
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with mock.patch('services.thumbnails.download_image', side_effect=images.__getitem__), \
+                mock.patch('services.management.commands.ingest_service_images.ingest_service_image',
+                           partial(ingest_service_image, storage=self.storage)), \
+                mock.patch('services.management.commands.ingest_service_images.bump_service_list_version'):
+            call_command('ingest_service_images', stdout=stdout, stderr=stderr)
+        self.assertIn('Обработано: 1, ошибок: 1', stdout.getvalue())
+        self.assertIn(f'#{self.service.pk}', stderr.getvalue())
+
+    def test_serializer_returns_thumbnail_urls(self):
+        thumbnails = self.ingest(make_image_bytes())
+        self.service.refresh_from_db()
+        with mock.patch('services.serializers.default_storage', self.storage):
+            data = ServiceListSerializer(self.service).data
+        self.assertEqual(data['thumbnails'], {width: f'/media/{name}' for width, name in thumbnails.items()})
+
+
+@override_settings(READ_REPLICA=True)
+class ReplicaRoutingTest(TestCase):
+    """
+    GET-запросы читают с реплики (в тестах она зеркалит default), общий кэш строится из
+    основной БД, а после записи пользователь на время читает из основной БД.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = User.objects.create_user('client', password='client-password')
+        self.service, = create_services(['Service'])
+
+    def capture_reads(self, request):
+        """
+        Ответ и пары (таблица, псевдоним БД), выбранные роутером для чтений запроса.
+        """
+        reads = set()
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            reads.add((model._meta.db_table, alias))
+            return alias
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', record):
+            response = request()
+        return response, reads
+
+    def test_get_reads_from_replica(self):
+        response, reads = self.capture_reads(
+            lambda: self.client.get(reverse('service-detail', args=[self.service.pk]))
+        )
+        self.assertIn(response.status_code, (200, 404))
+        self.assertIn(('services_service', 'replica'), reads)
+        self.assertNotIn('default', {alias for _, alias in reads})
+
+    def test_shared_list_entry_reads_from_primary(self):
+        bump_service_list_version()
+        response, reads = self.capture_reads(
+            lambda: self.client.get(reverse('service-list'), **auth_headers(self.user))
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(('services_service', 'default'), reads)
+        self.assertNotIn(('services_service', 'replica'), reads)
+        # Черновик пользователя - чтение этого запроса, оно идёт на реплику
+        self.assertIn(('services_application', 'replica'), reads)
+
+    def test_user_is_pinned_to_primary_after_write(self):
+        self.addCleanup(cache.delete, primary_pin_key(self.user.pk))
+        response = self.client.post(reverse('application-list'), {}, content_type='application/json',
+                                    **auth_headers(self.user))
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(0 < cache.ttl(primary_pin_key(self.user.pk)) <= settings.REPLICA_STICKY_SECONDS)
+
+        response, reads = self.capture_reads(
+            lambda: self.client.get(reverse('application-list'), **auth_headers(self.user))
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(('services_application', 'default'), reads)
+        self.assertNotIn('replica', {alias for _, alias in reads})
@@ -0,0 +1,88 @@
+import hashlib
+import io
+from http.client import HTTPException
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from botocore.exceptions import BotoCoreError, ClientError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Service
+
+# Картинки услуг скачиваются один раз, сохраняются в хранилище (MinIO) и ужимаются в WebP.
+# Имена файлов содержат хэш содержимого, поэтому их можно кэшировать бессрочно.
+
+THUMBNAIL_WIDTHS = (200, 600)
+THUMBNAIL_QUALITY = 80
+IMAGE_DOWNLOAD_TIMEOUT = 10
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+# Ошибки сети, декодирования (в т.ч. «бомба распаковки») и хранилища S3/MinIO:
+# услуга считается необработанной, прогон продолжается
+INGEST_ERRORS = (OSError, ValueError, HTTPException, Image.DecompressionBombError, BotoCoreError, ClientError)
+
+
+class ImageIngestError(Exception):
+    pass
+
+
+def download_image(url):
+    # urlopen умеет и file://, поэтому пропускаем только http(s)
+    if urlsplit(url).scheme not in ('http', 'https'):
+        raise ImageIngestError(f'Unsupported image URL: {url}')
+    request = Request(url, headers={'User-Agent': 'services-image-ingest/1.0'})
+    with urlopen(request, timeout=IMAGE_DOWNLOAD_TIMEOUT) as response:
+        data = response.read(MAX_IMAGE_BYTES + 1)
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ImageIngestError(f'Image is larger than {MAX_IMAGE_BYTES} bytes')
+    return data
+
+
+def save_once(storage, name, content):
+    # Одинаковое содержимое даёт одинаковое имя, повторно не загружаем
+    if storage.exists(name):
+        return name
+    return storage.save(name, ContentFile(content))
+
+
+def make_thumbnail(image, width):
+    thumbnail = image.copy()
+    thumbnail.thumbnail((width, width * 4))
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, 'WEBP', quality=THUMBNAIL_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def ingest_service_image(service, storage=default_storage):
+    """
+    Скачивает картинку услуги, сохраняет оригинал и WebP-миниатюры в хранилище.
+    Поля услуги обновляются через update(), поэтому кэш списка услуг сбрасывает вызывающий код.
+    """
+    try:
+        data = download_image(service.image)
+        image = Image.open(io.BytesIO(data))
+        image_format = (image.format or 'jpeg').lower()
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        prefix = f'services/{service.pk}/{digest}'
+        original = save_once(storage, f'{prefix}.{image_format}', data)
+        thumbnails = {
+            str(width): save_once(storage, f'{prefix}_{width}.webp', make_thumbnail(image, width))
+            for width in THUMBNAIL_WIDTHS
+        }
+    except INGEST_ERRORS as exc:
+        raise ImageIngestError(str(exc)) from exc
+
+    Service.objects.filter(pk=service.pk).update(
+        image_original=original,
+        thumbnails=thumbnails,
+        image_ingested_from=service.image,
+        updated_at=timezone.now(),
+    )
+    return thumbnails
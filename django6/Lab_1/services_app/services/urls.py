@@ -1,26 +1,45 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     ServiceAPIView,
+    ServiceImportAPIView,
     ApplicationAPIView,
+    ApplicationModerationAPIView,
+    ApplicationExportAPIView,
     ApplicationServiceAPIView,
+    ApplicationServicesBulkAPIView,
     RegisterAPIView,
     UserAPIView,
     AdminCheckView,
+    StatsAPIView,
     CurrentUserAPIView
 )
+from .serializers import TokenObtainPairWithClaimsSerializer, TokenRefreshWithClaimsSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
 
 
+# Под ASGI списки услуг и заявок и /api/me/ читаются асинхронными обработчиками
+if settings.ASYNC_READ_VIEWS:
+    from .async_views import service_list_view, application_list_view, current_user_view, application_events
+else:
+    service_list_view = ServiceAPIView.as_view()
+    application_list_view = ApplicationAPIView.as_view()
+    current_user_view = CurrentUserAPIView.as_view()
+
 urlpatterns = [
     # API для услуг
-    path('api/services/', ServiceAPIView.as_view(), name='service-list'),
+    path('api/services/', service_list_view, name='service-list'),
     path('api/services/<int:pk>/', ServiceAPIView.as_view(), name='service-detail'),
+    path('api/services/import/', ServiceImportAPIView.as_view(), name='service-import'),
     
     # API для заявок
-    path('api/applications/', ApplicationAPIView.as_view(), name='application-list'),
+    path('api/applications/', application_list_view, name='application-list'),
     path('api/applications/<int:pk>/', ApplicationAPIView.as_view(), name='application-detail'),
+    path('api/applications/export/', ApplicationExportAPIView.as_view(), name='application-export'),
+    path('api/applications/moderate/', ApplicationModerationAPIView.as_view(), name='application-moderate'),
+    path('api/applications/<int:pk>/services/', ApplicationServicesBulkAPIView.as_view(), name='application-services-bulk'),
     
     # API для связи заявок и услуг
     path('api/application-services/', ApplicationServiceAPIView.as_view(), name='application-service-list'),
@@ -31,14 +50,20 @@ urlpatterns = [
     path('api/users/<int:pk>/', UserAPIView.as_view(), name='user-detail'),
 
     path('api/register/', RegisterAPIView.as_view(), name='register'),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/', TokenObtainPairView.as_view(serializer_class=TokenObtainPairWithClaimsSerializer), name='token_obtain_pair'),
+    path('api/token/refresh/', TokenRefreshView.as_view(serializer_class=TokenRefreshWithClaimsSerializer), name='token_refresh'),
     
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     
     path('api/check-admin/', AdminCheckView.as_view(), name='check-admin'),
-    path('api/me/', CurrentUserAPIView.as_view(), name='current-user'),
+    path('api/stats/', StatsAPIView.as_view(), name='stats'),
+    path('api/me/', current_user_view, name='current-user'),
+
 
+]
 
-]
\ No newline at end of file
+# SSE-поток смен статусов держит соединение открытым и работает только под ASGI:
+# под WSGI Django дочитывал бы бесконечный асинхронный генератор до конца
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns.append(path('api/applications/events/', application_events, name='application-events'))
\ No newline at end of file
@@ -1,26 +1,77 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Service, Application, ApplicationService, User
-from .serializers import ServiceSerializer, ApplicationSerializer, ApplicationServiceSerializer, UserSerializer, RegisterSerializer
+from .models import Service, Application, ApplicationService, User, ApplicationDailyStats, ApplicationCompletionStats
+from .serializers import ServiceSerializer, ServiceListSerializer, ApplicationSerializer, ApplicationSummarySerializer, ApplicationServiceSerializer, UserSerializer, RegisterSerializer, ServiceIdsSerializer, ModerationSerializer, resolve_draft_application_id
 from django_filters import rest_framework as filters
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import generics
-from django.core.cache import cache
+from django.utils import timezone
+from datetime import datetime, timedelta
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+import csv
 import json
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, FloatField, Max, Prefetch, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Now
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from .cache import SERVICE_LIST_TIMEOUT, get_or_recompute, service_list_cache_key, make_cached_body, overlay_response
+from .conditional import make_etag, not_modified, set_validators
+from .events import publish_status_changes
+from .importers import CATALOG_FORMATS, detect_format, import_services, read_catalog
+from .routers import ReplicaReadMixin, primary_reads
+from .pagination import ServiceCursorPagination, ApplicationCursorPagination, IdCursorPagination
 
 # Фильтр для услуг
 class ServiceFilter(filters.FilterSet):
     name = filters.CharFilter(field_name="name", lookup_expr='icontains')
+    q = filters.CharFilter(method='search')
 
     class Meta:
         model = Service
         fields = ['name']
 
+    def search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по названию и описанию (русский и английский)
+        и поиск по триграммам названия (опечатки) одним запросом.
+        Результат аннотирован полем rank: сначала полнотекстовые совпадения, затем похожие названия.
+        """
+        query = (
+            SearchQuery(value, config='russian', search_type='websearch')
+            | SearchQuery(value, config='english', search_type='websearch')
+        )
+        # ts_rank не больше 1, поэтому +1 ставит полнотекстовые совпадения выше похожих названий
+        rank = Case(
+            When(search_vector=query, then=SearchRank(F('search_vector'), query) + 1),
+            default=TrigramSimilarity('name', value),
+            output_field=FloatField(),
+        )
+        # name__trigram_similar - оператор %, он идёт по service_name_trgm_idx
+        # (порог похожести - pg_trgm.similarity_threshold, по умолчанию 0.3)
+        return queryset.filter(Q(search_vector=query) | Q(name__trigram_similar=value)).annotate(rank=rank)
+
+def save_application(serializer, **kwargs):
+    """
+    Сохраняет заявку; второй черновик пользователя (application_one_draft_per_user) - 409.
+    """
+    try:
+        with transaction.atomic():
+            serializer.save(**kwargs)
+    except IntegrityError:
+        return Response(
+            {"detail": "Draft application already exists."},
+            status=status.HTTP_409_CONFLICT
+        )
+    return Response(serializer.data)
+
 # APIView для управления услугами
-class ServiceAPIView(APIView):
+class ServiceAPIView(ReplicaReadMixin, APIView):
 
     filter_class = ServiceFilter
     
@@ -32,24 +83,48 @@ class ServiceAPIView(APIView):
             service = self.get_queryset().filter(pk=pk).first()
             if not service:
                 return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
-            serializer = ServiceSerializer(service, context={'request': request})
-            return Response(serializer.data)
+            draft_application_id = resolve_draft_application_id(request)
+            etag = make_etag('service', service.pk, service.updated_at.timestamp(), draft_application_id)
+            response = not_modified(request, etag, service.updated_at)
+            if response is None:
+                serializer = ServiceSerializer(service, context={'request': request})
+                response = Response(serializer.data)
+            return set_validators(response, etag, service.updated_at)
         
-        # Создаём ключ для кэша на основе GET-параметров
-        params = request.GET.urlencode()
-        cache_key = f"service_list_{params}"
-        cached_json = cache.get(cache_key)
-        
-        if cached_json:
-            data = json.loads(cached_json)
-            return Response(data)
+        # Общая часть списка не зависит от пользователя, поэтому один ключ на фильтр для всех
+        # Курсор и размер страницы входят в ключ, так что кэшируется каждая страница отдельно
+        cache_key = service_list_cache_key(request.GET)
+        draft_application_id = resolve_draft_application_id(request)
 
-        queryset = self.filter_class(request.GET, queryset=self.get_queryset()).qs
-        serializer = ServiceSerializer(queryset, many=True, context={'request': request})
-        
-        # Сохраняем результат в Redis на 5 минут (300 секунд)
-        cache.set(cache_key, json.dumps(serializer.data), timeout=300)
-        return Response(serializer.data)
+        # Ключ кэша содержит поколение списка, поэтому годится и как версия для ETag
+        etag = make_etag(cache_key, draft_application_id)
+        response = not_modified(request, etag)
+        if response is not None:
+            return set_validators(response, etag)
+
+        entry = get_or_recompute(cache_key, lambda: self.build_list_entry(request), SERVICE_LIST_TIMEOUT)
+
+        # Пользовательская часть (черновик) считается на каждый запрос и добавляется к общей
+        response = overlay_response(entry, draft_application_id=draft_application_id)
+        return set_validators(response, etag)
+
+    def build_list_entry(self, request):
+        """
+        Общая (не зависящая от пользователя) страница списка услуг в виде готовых байтов.
+        Строится из основной БД: запись лежит в кэше до следующей смены поколения.
+        """
+        with primary_reads():
+            queryset = self.filter_class(request.GET, queryset=self.get_queryset()).qs
+            paginator = ServiceCursorPagination()
+            page = paginator.paginate_queryset(queryset, request, view=self)
+            serializer = ServiceListSerializer(page, many=True, context={'request': request})
+            data = serializer.data
+        # Храним уже отрендеренные байты, чтобы при попадании не сериализовать заново
+        return make_cached_body({
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'services': data,
+        })
     
     def post(self, request):
         if not request.user.is_staff:
@@ -77,7 +152,7 @@ class ServiceAPIView(APIView):
             if serializer.is_valid():
                 # Автоматически назначаем модератора при первом изменении
                 if not application.moderator and 'status' in request.data:
-                    serializer.save(moderator=request.user)
+                    serializer.save(moderator_id=request.user.id)
                 else:
                     serializer.save()
                 return Response(serializer.data)
@@ -85,11 +160,11 @@ class ServiceAPIView(APIView):
         
         # Для обычных пользователей оставляем текущие проверки
         if application.status == 'draft':
-            if request.user != application.user:
+            if request.user.id != application.user_id:
                 return Response({"detail": "You can only edit your own drafts."}, 
                             status=status.HTTP_403_FORBIDDEN)
         elif application.status == 'formatted':
-            if request.user != application.moderator:
+            if request.user.id != application.moderator_id:
                 return Response({"detail": "Only assigned moderator can change formatted applications."}, 
                             status=status.HTTP_403_FORBIDDEN)
         
@@ -116,39 +191,119 @@ class ServiceAPIView(APIView):
         service.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+# APIView для импорта каталога услуг (CSV/JSON/JSON Lines)
+class ServiceImportAPIView(APIView):
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "file is required."}, status=status.HTTP_400_BAD_REQUEST)
+        catalog_format = request.data.get('format') or detect_format(upload.name)
+        if catalog_format not in CATALOG_FORMATS:
+            return Response({"detail": "format must be csv, json or jsonl."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            report = import_services(read_catalog(upload.file, catalog_format))
+        except (ValueError, csv.Error) as exc:
+            return Response({"detail": f"Invalid catalog: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
 # APIView для управления заявками
-class ApplicationAPIView(APIView):
+class ApplicationAPIView(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]  # Добавляем глобальную проверку аутентификации
     
+    def get_base_queryset(self):
+        queryset = Application.objects.filter(is_deleted=False)
+        
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user_id=self.request.user.id)
+        return queryset
+
     def get_queryset(self):
         """
         Оптимизированный queryset с select_related для user и moderator
         """
-        queryset = Application.objects.filter(is_deleted=False)
-        
-        if not self.request.user.is_staff:
-            queryset = queryset.filter(user=self.request.user)
-            
-        return queryset.select_related('user', 'moderator')
+        queryset = self.get_base_queryset()
+
+        # Услуги всех заявок страницы подгружаются одним запросом только с нужными полями
+        application_services = Prefetch(
+            'application_services',
+            queryset=ApplicationService.objects.select_related('service').only(
+                'id', 'application', 'service__id', 'service__name', 'service__image'
+            ),
+        )
+        return queryset.select_related('user', 'moderator').prefetch_related(application_services)
     
     def get(self, request, pk=None):
         if pk:
-            application = self.get_queryset().filter(pk=pk).first()
-            if not application:
+            # Сначала только updated_at: при актуальной версии у клиента заявку не грузим
+            updated_at = self.get_base_queryset().filter(pk=pk).values_list('updated_at', flat=True).first()
+            if not updated_at:
                 return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
-            serializer = ApplicationSerializer(application, context={'request': request})
-            return Response(serializer.data)
+            etag = make_etag('application', pk, updated_at.timestamp())
+            response = not_modified(request, etag, updated_at)
+            if response is None:
+                application = self.get_queryset().filter(pk=pk).first()
+                serializer = ApplicationSerializer(application, context={'request': request})
+                response = Response(serializer.data)
+            return set_validators(response, etag, updated_at)
         
-        serializer = ApplicationSerializer(self.get_queryset(), many=True, context={'request': request})
-        return Response(serializer.data)
+        etag = self.get_list_etag(request)
+        response = not_modified(request, etag)
+        if response is None:
+            response = Response(self.get_list_data(request))
+        return set_validators(response, etag)
+
+    def get_list_etag(self, request):
+        """
+        ETag списка из max(updated_at) по заявкам вместе с удалёнными: мягкое удаление
+        тоже сдвигает updated_at. Агрегат берётся по индексу updated_at, а не по всей таблице.
+        Last-Modified не отдаём: секундной точности мало для опроса списка.
+        """
+        queryset = Application.objects.all()
+        if not request.user.is_staff:
+            queryset = queryset.filter(user_id=request.user.id)
+        last_modified = queryset.aggregate(last_modified=Max('updated_at'))['last_modified']
+        return make_etag(
+            'applications', request.user.id, request.user.is_staff, request.GET.urlencode(),
+            last_modified.timestamp() if last_modified else None,
+        )
+
+    def get_list_data(self, request):
+        paginator = ApplicationCursorPagination()
+        if request.GET.get('summary'):
+            # ?summary=1: состав услуг из service_count/services_summary, одна таблица без prefetch
+            queryset = self.get_base_queryset().select_related('user', 'moderator')
+            serializer_class = ApplicationSummarySerializer
+        else:
+            queryset = self.get_queryset()
+            serializer_class = ApplicationSerializer
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = serializer_class(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data).data
     
     def post(self, request):
+        # У пользователя может быть только один черновик (частичный уникальный индекс)
+        draft = Application.objects.filter(user_id=request.user.id, status='draft', is_deleted=False).first()
+        if draft:
+            serializer = ApplicationSerializer(draft, context={'request': request})
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
         serializer = ApplicationSerializer(
             data=request.data, 
             context={'request': request}
         )
         if serializer.is_valid():
-            serializer.save(user=request.user)
+            try:
+                with transaction.atomic():
+                    serializer.save(user_id=request.user.id)
+            except IntegrityError:
+                return Response(
+                    {"detail": "Draft application already exists."},
+                    status=status.HTTP_409_CONFLICT
+                )
             return Response(
                 serializer.data, 
                 status=status.HTTP_201_CREATED
@@ -174,10 +329,8 @@ class ApplicationAPIView(APIView):
             if serializer.is_valid():
                 # Сохраняем модератора при первом изменении
                 if not application.moderator and 'status' in request.data:
-                    serializer.save(moderator=request.user)
-                else:
-                    serializer.save()
-                return Response(serializer.data)
+                    return save_application(serializer, moderator_id=request.user.id)
+                return save_application(serializer)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         return Response(
@@ -193,7 +346,7 @@ class ApplicationAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        if request.user != application.user and not request.user.is_staff:
+        if request.user.id != application.user_id and not request.user.is_staff:
             return Response(
                 {"detail": "You can't delete this application."}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -213,18 +366,172 @@ class ApplicationAPIView(APIView):
             return True
             
         if application.status == 'draft':
-            return user == application.user
+            return user.id == application.user_id
             
         if application.status == 'formatted':
-            return user == application.moderator
+            return user.id == application.moderator_id
             
         return False
 
+# APIView для пакетной модерации заявок
+class ApplicationModerationAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = ModerationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        application_ids = list(dict.fromkeys(serializer.validated_data['applications']))
+        new_status = serializer.validated_data['status']
+
+        with transaction.atomic():
+            # Блокируем строки, чтобы статусы в отчёте совпали с тем, что обновил UPDATE
+            current = {
+                application_id: (application_status, user_id)
+                for application_id, application_status, user_id in
+                Application.objects.select_for_update()
+                .filter(pk__in=application_ids, is_deleted=False)
+                .values_list('id', 'status', 'user_id')
+            }
+            # Один UPDATE на всю пачку; модератор назначается, только если его ещё нет
+            Application.objects.filter(pk__in=application_ids, status='formatted', is_deleted=False).update(
+                status=new_status,
+                moderator=Coalesce(F('moderator'), Value(request.user.pk)),
+                completed_at=Now(),
+                updated_at=Now(),
+            )
+
+        results = []
+        changes = []
+        for application_id in application_ids:
+            if application_id not in current:
+                results.append({'application': application_id, 'result': 'not_found'})
+                continue
+            application_status, user_id = current[application_id]
+            if application_status != 'formatted':
+                results.append({'application': application_id, 'result': 'wrong_status',
+                                'status': application_status})
+            else:
+                changes.append((application_id, user_id, application_status, new_status))
+                results.append({'application': application_id, 'result': new_status})
+
+        # UPDATE не вызывает сигналы, поэтому о смене статусов сообщаем сами
+        if changes:
+            publish_status_changes(changes)
+        return Response({'results': results})
+
+class Echo:
+    """
+    Псевдо-буфер для csv.writer: строка возвращается сразу, а не копится в памяти.
+    """
+    def write(self, value):
+        return value
+
+
+# APIView для потоковой выгрузки заявок (CSV/NDJSON)
+class ApplicationExportAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    # Поля выгрузки: имя колонки -> поле для values_list (пользователь и модератор через join)
+    EXPORT_FIELDS = {
+        'id': 'id',
+        'status': 'status',
+        'user': 'user__username',
+        'moderator': 'moderator__username',
+        'created_at': 'created_at',
+        'generated_at': 'generated_at',
+        'completed_at': 'completed_at',
+        'service_count': 'service_count',
+    }
+    # Строк за одну выборку из серверного курсора
+    CHUNK_SIZE = 2000
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= здесь выбирает формат выгрузки, а не рендерер DRF
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in ('csv', 'ndjson'):
+            return Response({"detail": "format must be csv or ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Application.objects.filter(is_deleted=False)
+        if request.GET.get('status'):
+            queryset = queryset.filter(status=request.GET['status'])
+        for param, lookup in (('date_from', 'created_at__date__gte'), ('date_to', 'created_at__date__lte')):
+            if param in request.GET:
+                value = parse_date(request.GET[param])
+                if value is None:
+                    return Response({"detail": f"{param} must be a date (YYYY-MM-DD)."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                queryset = queryset.filter(**{lookup: value})
+
+        # iterator() читает серверным курсором порциями, память не зависит от числа строк
+        rows = queryset.order_by('id').values_list(*self.EXPORT_FIELDS.values()).iterator(chunk_size=self.CHUNK_SIZE)
+        columns = list(self.EXPORT_FIELDS)
+
+        if export_format == 'csv':
+            content, content_type = self.csv_lines(columns, rows), 'text/csv'
+        else:
+            content, content_type = self.ndjson_lines(columns, rows), 'application/x-ndjson'
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="applications.{export_format}"'
+        return response
+
+    def csv_lines(self, columns, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+
+    def ndjson_lines(self, columns, rows):
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+# APIView статистики для модераторов (из материализованных представлений)
+class StatsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    # Сколько последних дней отдавать в разбивке по дням
+    DEFAULT_DAYS = 30
+
+    def get(self, request):
+        try:
+            days = int(request.GET.get('days', self.DEFAULT_DAYS))
+        except ValueError:
+            return Response({"detail": "days must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Запросы идут к небольшим материализованным представлениям, а не к таблице заявок
+        daily = ApplicationDailyStats.objects.all()
+        by_status = daily.values('status').annotate(total=Sum('total')).order_by('status')
+        by_moderator = (
+            daily.exclude(moderator_id=0).values('moderator_id', 'status')
+            .annotate(total=Sum('total')).order_by('moderator_id', 'status')
+        )
+        since = timezone.now().date() - timedelta(days=days)
+        by_day = (
+            daily.filter(day__gte=since).values('day', 'status')
+            .annotate(total=Sum('total')).order_by('day', 'status')
+        )
+        completion = ApplicationCompletionStats.objects.first()
+
+        return Response({
+            'by_status': {row['status']: row['total'] for row in by_status},
+            'by_moderator': [
+                {'moderator': row['moderator_id'], 'status': row['status'], 'total': row['total']}
+                for row in by_moderator
+            ],
+            'by_day': list(by_day),
+            'completed': completion.completed if completion else 0,
+            'median_completion_seconds': completion.median_completion_seconds if completion else None,
+            'median_processing_seconds': completion.median_processing_seconds if completion else None,
+            'refreshed_at': completion.refreshed_at if completion else None,
+        })
+
 # APIView для управления связью заявки и услуги
 class ApplicationServiceAPIView(APIView):
     
     def get_queryset(self):
-        return ApplicationService.objects.filter(application__user=self.request.user)
+        return ApplicationService.objects.filter(application__user_id=self.request.user.id)
     
     def get(self, request, pk=None):
         if pk:
@@ -234,17 +541,21 @@ class ApplicationServiceAPIView(APIView):
             serializer = ApplicationServiceSerializer(app_service, context={'request': request})
             return Response(serializer.data)
         
-        serializer = ApplicationServiceSerializer(self.get_queryset(), many=True, context={'request': request})
-        return Response(serializer.data)
+        paginator = IdCursorPagination()
+        page = paginator.paginate_queryset(self.get_queryset(), request, view=self)
+        serializer = ApplicationServiceSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
     
     def post(self, request):
         serializer = ApplicationServiceSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             application = serializer.validated_data['application']
-            if application.user != request.user:
+            if application.user_id != request.user.id:
                 return Response({"detail": "You can't add services to this application."}, 
                               status=status.HTTP_403_FORBIDDEN)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                Application.refresh_services_summary(application.pk)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -253,16 +564,20 @@ class ApplicationServiceAPIView(APIView):
         if not app_service:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
         
-        if app_service.application.user != request.user:
+        if app_service.application.user_id != request.user.id:
             return Response({"detail": "You can't edit this application service."}, 
                           status=status.HTTP_403_FORBIDDEN)
         
+        old_application_id = app_service.application_id
         serializer = ApplicationServiceSerializer(app_service, data=request.data, context={'request': request}, partial=True)
         if serializer.is_valid():
-            instance = serializer.save()
-            if 'quantity' in request.data:
-                instance.quantity = request.data['quantity']
-                instance.save()
+            with transaction.atomic():
+                instance = serializer.save()
+                if 'quantity' in request.data:
+                    instance.quantity = request.data['quantity']
+                    instance.save()
+                for application_id in {old_application_id, instance.application_id}:
+                    Application.refresh_services_summary(application_id)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -271,15 +586,83 @@ class ApplicationServiceAPIView(APIView):
         if not app_service:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
         
-        if app_service.application.user != request.user:
+        if app_service.application.user_id != request.user.id:
             return Response({"detail": "You can't delete this application service."}, 
                           status=status.HTTP_403_FORBIDDEN)
         
-        app_service.delete()
+        with transaction.atomic():
+            app_service.delete()
+            Application.refresh_services_summary(app_service.application_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+# APIView для пакетного добавления/удаления услуг в черновике
+class ApplicationServicesBulkAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get_application(self, request, pk):
+        return Application.objects.filter(
+            pk=pk, user_id=request.user.id, status='draft', is_deleted=False
+        ).first()
+
+    def get_service_ids(self, request):
+        serializer = ServiceIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Убираем повторы, сохраняя порядок из запроса
+        return list(dict.fromkeys(serializer.validated_data['services']))
+
+    def post(self, request, pk):
+        application = self.get_application(request, pk)
+        if not application:
+            return Response({"detail": "Draft application not found."}, status=status.HTTP_404_NOT_FOUND)
+        service_ids = self.get_service_ids(request)
+
+        with transaction.atomic():
+            # Одна проверка существования на весь список
+            existing = set(Service.objects.filter(pk__in=service_ids, is_deleted=False).values_list('id', flat=True))
+            attached = set(ApplicationService.objects.filter(
+                application=application, service_id__in=existing
+            ).values_list('service_id', flat=True))
+            ApplicationService.objects.bulk_create(
+                [ApplicationService(application=application, service_id=service_id)
+                 for service_id in service_ids if service_id in existing and service_id not in attached],
+                ignore_conflicts=True,
+            )
+            if existing - attached:
+                Application.refresh_services_summary(application.pk)
+
+        results = []
+        for service_id in service_ids:
+            if service_id not in existing:
+                result = 'not_found'
+            elif service_id in attached:
+                result = 'already_added'
+            else:
+                result = 'added'
+            results.append({'service': service_id, 'result': result})
+        return Response({'application': application.pk, 'results': results})
+
+    def delete(self, request, pk):
+        application = self.get_application(request, pk)
+        if not application:
+            return Response({"detail": "Draft application not found."}, status=status.HTTP_404_NOT_FOUND)
+        service_ids = self.get_service_ids(request)
+
+        with transaction.atomic():
+            attached = set(ApplicationService.objects.filter(
+                application=application, service_id__in=service_ids
+            ).values_list('service_id', flat=True))
+            if attached:
+                ApplicationService.objects.filter(application=application, service_id__in=attached).delete()
+                Application.refresh_services_summary(application.pk)
+
+        results = [
+            {'service': service_id, 'result': 'removed' if service_id in attached else 'not_in_application'}
+            for service_id in service_ids
+        ]
+        return Response({'application': application.pk, 'results': results})
+
 # APIView для управления пользователями
-class UserAPIView(APIView):
+class UserAPIView(ReplicaReadMixin, APIView):
     def get_queryset(self):
         return User.objects.all()
     
@@ -291,8 +674,10 @@ class UserAPIView(APIView):
             serializer = UserSerializer(user, context={'request': request})
             return Response(serializer.data)
         
-        serializer = UserSerializer(self.get_queryset(), many=True, context={'request': request})
-        return Response(serializer.data)
+        paginator = IdCursorPagination()
+        page = paginator.paginate_queryset(self.get_queryset(), request, view=self)
+        serializer = UserSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
 
     def delete(self, request, pk):
         try:
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'services',
     'corsheaders',
     'storages',
@@ -57,13 +58,20 @@ INSTALLED_APPS = [
 ]
 
 REST_FRAMEWORK = {
+    # JSON кодируется через orjson; браузерный API нужен только при разработке
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'services.renderers.ORJSONRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
     ],
+    'DEFAULT_PARSER_CLASSES': [
+        'services.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # API под /api/ работает только по JWT; сессии остаются админке и шаблонам
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.SessionAuthentication',  
+        # Пользователь строится из claims токена, без запроса к таблице пользователей
+        'rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Для теста
@@ -72,6 +80,10 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+SIMPLE_JWT = {
+    'TOKEN_USER_CLASS': 'services.authentication.CachedTokenUser',
+}
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'My API',
     'DESCRIPTION': 'API Documentation',
@@ -94,12 +106,16 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'services.middleware.PrimaryPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'services_app.urls'
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Сессии читаются из Redis, в таблицу ходим только при промахе.
+# Чтобы хранить сессии только в Redis: 'django.contrib.sessions.backends.cache'
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
 
 TEMPLATES = [
     {
@@ -118,6 +134,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'services_app.wsgi.application'
+ASGI_APPLICATION = 'services_app.asgi.application'
+
+# Асинхронные обработчики чтения и SSE-поток /api/applications/events/ (services/async_views.py);
+# включать только при запуске через uvicorn: uvicorn services_app.asgi:application
+ASYNC_READ_VIEWS = False
 
 
 # Database
@@ -131,9 +152,43 @@ DATABASES = {
         'PASSWORD': '123456',  # Пароль
         'HOST': 'localhost',  # Хост. Если контейнер на том же сервере, это будет 'localhost'
         'PORT': '5432',  # Порт. По умолчанию для PostgreSQL
+        # Пул соединений psycopg 3 вместо нового подключения на каждый запрос
+        # (с пулом CONN_MAX_AGE должен быть 0); перед выдачей соединение проверяется
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': 2,
+                'max_size': 10,
+                'timeout': 10,
+            },
+            # Параметры передаются отдельно от текста запроса, и psycopg готовит
+            # повторяющиеся запросы (список услуг, черновик, заявки) как prepared statements
+            # на сервере начиная со второго выполнения на соединении
+            'server_side_binding': True,
+            'prepare_threshold': 2,
+        },
     }
 }
 
+# Реплика для чтения (GET в ServiceAPIView, ApplicationAPIView, UserAPIView).
+# Без DB_REPLICA_HOST всё читается из основной БД (READ_REPLICA = False); псевдоним replica
+# есть всегда, в тестах он зеркалит default, чтобы маршрутизацию можно было проверить
+READ_REPLICA = bool(os.environ.get('DB_REPLICA_HOST'))
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+    'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+    'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+    'OPTIONS': {**DATABASES['default']['OPTIONS'], 'pool': dict(DATABASES['default']['OPTIONS']['pool'])},
+    'TEST': {'MIRROR': 'default'},
+}
+
+DATABASE_ROUTERS = ['services.routers.ReplicaRouter']
+
+# Сколько секунд после записи пользователь читает с основной БД (задержка репликации)
+REPLICA_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -181,12 +236,23 @@ AWS_ACCESS_KEY_ID = 'maksi'  # Замените на ваш ключ досту
 AWS_SECRET_ACCESS_KEY = '12345678'  # Замените на ваш секретный ключ
 AWS_STORAGE_BUCKET_NAME = 'web'  # Замените на имя вашего бакета
 AWS_S3_ENDPOINT_URL = 'https://localhost:9000'  # Замените на URL вашего MinIO-сервера
+# Имена файлов картинок содержат хэш содержимого, поэтому кэшировать их можно бессрочно
 AWS_S3_OBJECT_PARAMETERS = {
-    'CacheControl': 'max-age=86400',
+    'CacheControl': 'public, max-age=31536000, immutable',
 }
+# Бакет с картинками публичный: постоянные URL без подписи кэшируются браузером и CDN
+AWS_QUERYSTRING_AUTH = False
 
 # Указываем, что используем MinIO как хранилище для медиафайлов
-DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+# (DEFAULT_FILE_STORAGE удалён в Django 5.1, вместо него STORAGES)
+STORAGES = {
+    'default': {
+        'BACKEND': 'storages.backends.s3boto3.S3Boto3Storage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')